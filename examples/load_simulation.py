@@ -9,7 +9,10 @@ Run:
 """
 
 import asyncio
+import sys
 import time
+from collections import Counter, deque
+from collections.abc import Awaitable, Callable
 from typing import Any
 
 from mcp_backpressure import BackpressureMiddleware, OverloadError
@@ -43,6 +46,18 @@ async def simulate_request(
     return await middleware(fake_request, call_next)
 
 
+async def run_all(
+    make_request: Callable[[int], Awaitable[dict]],
+    count: int,
+) -> list[dict]:
+    """Run count requests concurrently (TaskGroup on 3.11+, gather on 3.10)."""
+    if sys.version_info >= (3, 11):
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(make_request(i)) for i in range(count)]
+        return [task.result() for task in tasks]
+    return await asyncio.gather(*(make_request(i) for i in range(count)))
+
+
 async def run_simulation():
     """Run load simulation."""
     print("=" * 60)
@@ -54,13 +69,20 @@ async def run_simulation():
     QUEUE_SIZE = 10
     QUEUE_TIMEOUT = 2.0
 
+    # on_overload runs on the rejection path: only buffer and signal,
+    # the reporter task prints
+    overloads: deque[OverloadError] = deque(maxlen=1000)
+    changed = asyncio.Event()
+
+    def on_overload(error: OverloadError) -> None:
+        overloads.append(error)
+        changed.set()
+
     middleware = BackpressureMiddleware(
         max_concurrent=MAX_CONCURRENT,
         queue_size=QUEUE_SIZE,
         queue_timeout=QUEUE_TIMEOUT,
-        on_overload=lambda e: print(
-            f"⚠️  OVERLOAD: {e.reason} (active={e.active}, queued={e.queued})"
-        ),
+        on_overload=on_overload,
     )
 
     # Create simulated tool
@@ -94,22 +116,20 @@ async def run_simulation():
         except Exception as e:
             return {"id": req_id, "status": "error", "error": str(e)}
 
-    # Launch all requests concurrently
-    tasks = [asyncio.create_task(make_request(i)) for i in range(NUM_REQUESTS)]
-
-    # Show metrics during execution
-    print("Monitoring metrics:")
-    metrics_task = asyncio.create_task(monitor_metrics(middleware, duration=3.0))
+    # Report overloads and metrics as rejections happen
+    print("Monitoring overloads:")
+    report_task = asyncio.create_task(report_overloads(middleware, overloads, changed))
 
-    # Wait for all requests to complete
-    results = await asyncio.gather(*tasks)
+    # Launch all requests concurrently and wait for them to complete
+    results = await run_all(make_request, NUM_REQUESTS)
 
-    # Stop metrics monitoring
-    metrics_task.cancel()
+    # Stop overload reporting
+    report_task.cancel()
     try:
-        await metrics_task
+        await report_task
     except asyncio.CancelledError:
         pass
+    flush_overloads(overloads)
 
     elapsed = time.monotonic() - start_time
 
@@ -118,21 +138,27 @@ async def run_simulation():
     print("Results Summary")
     print("=" * 60)
 
-    successful = [r for r in results if r["status"] == "success"]
-    overloaded = [r for r in results if r["status"] == "overload"]
-    errors = [r for r in results if r["status"] == "error"]
-
-    print(f"\n✅ Successful: {len(successful)}")
-    print(f"⚠️  Overloaded: {len(overloaded)}")
-    print(f"❌ Errors: {len(errors)}")
-
-    if overloaded:
-        # Group by reason
-        reasons = {}
-        for r in overloaded:
-            reason = r["reason"]
-            reasons[reason] = reasons.get(reason, 0) + 1
-
+    # Single pass over results
+    successful = overloaded = errors = 0
+    reasons: Counter[str] = Counter()
+    example_error = None
+    for r in results:
+        status = r["status"]
+        if status == "success":
+            successful += 1
+        elif status == "overload":
+            overloaded += 1
+            reasons[r["reason"]] += 1
+            if example_error is None:
+                example_error = r["error"]
+        else:
+            errors += 1
+
+    print(f"\n✅ Successful: {successful}")
+    print(f"⚠️  Overloaded: {overloaded}")
+    print(f"❌ Errors: {errors}")
+
+    if reasons:
         print("\nOverload reasons:")
         for reason, count in reasons.items():
             print(f"  - {reason}: {count}")
@@ -151,28 +177,47 @@ async def run_simulation():
     print(f"🎯 Completed executions: {tool.completed}")
 
     # Show example error payload
-    if overloaded:
+    if example_error is not None:
         print("\n" + "=" * 60)
         print("Example Overload Error Payload (JSON-RPC)")
         print("=" * 60)
         import json
 
-        example_error = overloaded[0]["error"]
         print(json.dumps(example_error, indent=2))
 
     print("\n" + "=" * 60)
 
 
-async def monitor_metrics(middleware: BackpressureMiddleware, duration: float):
-    """Monitor and print metrics during simulation."""
-    end_time = asyncio.get_running_loop().time() + duration
-    while asyncio.get_running_loop().time() < end_time:
-        metrics = await middleware.get_metrics_async()
+def flush_overloads(overloads: deque[OverloadError]) -> None:
+    """Print and clear buffered overload events."""
+    lines = []
+    while overloads:
+        e = overloads.popleft()
+        lines.append(f"⚠️  OVERLOAD: {e.reason} (active={e.active}, queued={e.queued})")
+    if lines:
+        print("\n".join(lines))
+
+
+async def report_overloads(
+    middleware: BackpressureMiddleware,
+    overloads: deque[OverloadError],
+    changed: asyncio.Event,
+) -> None:
+    """
+    Print buffered overload events and a metrics snapshot when signalled.
+
+    Wakes only when on_overload sets the event; a burst of rejections is
+    coalesced into a single report instead of being polled on a timer.
+    """
+    while True:
+        await changed.wait()
+        changed.clear()
+        flush_overloads(overloads)
+        metrics = middleware.get_metrics()
         print(
             f"  [metrics] active={metrics.active}, queued={metrics.queued}, "
             f"rejected={metrics.total_rejected}"
         )
-        await asyncio.sleep(0.5)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,22 @@
 """Error classes for mcp-backpressure middleware"""
 
+import json
+from collections.abc import Callable
 from typing import Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+
+def _dumps_stdlib(obj: Any) -> bytes:
+    # Match orjson byte for byte: compact separators and raw UTF-8, not \u escapes
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+_dumps: Callable[[Any], bytes] = orjson.dumps if orjson is not None else _dumps_stdlib
+
 
 class OverloadError(Exception):
     """
@@ -46,7 +61,14 @@ class OverloadError(Exception):
         self.queue_timeout_ms = queue_timeout_ms
         self.retry_after_ms = retry_after_ms
 
-        super().__init__(f"{message}: {reason}")
+        self._json_bytes: bytes | None = None
+
+        # args keep message and reason for repr() and tracebacks; the joined
+        # string is formatted lazily in __str__ since most rejections are never printed
+        super().__init__(message, reason)
+
+    def __str__(self) -> str:
+        return f"{self.message}: {self.reason}"
 
     @property
     def data(self) -> dict[str, Any]:
@@ -73,3 +95,20 @@ class OverloadError(Exception):
             "message": self.message,
             "data": self.data,
         }
+
+    def to_json_bytes(self) -> bytes:
+        """
+        Serialize the JSON-RPC error object to compact UTF-8 JSON.
+
+        Uses orjson when installed (``pip install mcp-backpressure[fast]``),
+        otherwise the standard library encoder with the same compact layout.
+        The result is memoized: it reflects the error's fields at the first
+        call, and later attribute changes do not update it.
+
+        Returns:
+            Encoded JSON-RPC error object
+        """
+        json_bytes = self._json_bytes
+        if json_bytes is None:
+            json_bytes = self._json_bytes = _dumps(self.to_json_rpc())
+        return json_bytes
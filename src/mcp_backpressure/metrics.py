@@ -1,16 +1,15 @@
 """Metrics tracking for backpressure middleware"""
 
-import asyncio
-from dataclasses import dataclass
+from collections.abc import Sized
+from enum import IntEnum
+from typing import NamedTuple
 
 
-@dataclass
-class BackpressureMetrics:
+class BackpressureMetrics(NamedTuple):
     """
     Metrics for backpressure middleware.
 
-    Tracks current state and total counters for monitoring.
-    Thread-safe through internal lock.
+    Read-only snapshot of current state and total counters for monitoring.
     """
 
     active: int = 0
@@ -32,71 +31,70 @@ class BackpressureMetrics:
     """Number of requests rejected due to queue timeout"""
 
 
+class RejectReason(IntEnum):
+    """Rejection reasons, used as indexes into the per-reason counters."""
+
+    CONCURRENCY_LIMIT = 0
+    QUEUE_FULL = 1
+    QUEUE_TIMEOUT = 2
+
+
 class MetricsTracker:
     """
-    Thread-safe metrics tracker for backpressure middleware.
+    Metrics tracker for backpressure middleware.
 
-    Provides atomic operations for updating counters.
+    All updates are plain synchronous integer operations: asyncio runs a
+    single coroutine at a time, so no update can interleave with another
+    and no lock is needed. The middleware adjusts the _active gauge in
+    place on its per-request path rather than through a method.
+
+    The queued gauge is not a separate counter: it is the length of the
+    middleware's waiter queue, so the two can never disagree. Likewise the
+    rejection total is the sum of the per-reason counters.
     """
 
-    def __init__(self):
+    __slots__ = (
+        "_active",
+        "_waiters",
+        "_rejected",
+    )
+
+    def __init__(self, waiters: Sized = ()):
+        """
+        Create a MetricsTracker.
+
+        Args:
+            waiters: Queue of waiting requests; its length is reported as queued
+        """
         self._active = 0
-        self._queued = 0
-        self._total_rejected = 0
-        self._rejected_concurrency_limit = 0
-        self._rejected_queue_full = 0
-        self._rejected_queue_timeout = 0
-        self._lock = asyncio.Lock()
-
-    async def increment_active(self) -> None:
-        """Increment active counter."""
-        async with self._lock:
-            self._active += 1
-
-    async def decrement_active(self) -> None:
-        """Decrement active counter."""
-        async with self._lock:
-            self._active -= 1
-
-    async def increment_queued(self) -> None:
-        """Increment queued counter."""
-        async with self._lock:
-            self._queued += 1
-
-    async def decrement_queued(self) -> None:
-        """Decrement queued counter."""
-        async with self._lock:
-            self._queued -= 1
-
-    async def increment_rejected(self, reason: str) -> None:
+        self._waiters = waiters
+        # Rejections per reason, indexed by RejectReason
+        self._rejected = [0] * len(RejectReason)
+
+    def incr_rejected(self, reason: RejectReason) -> None:
         """
-        Increment rejection counters.
+        Increment the rejection counter for a reason.
 
         Args:
-            reason: Rejection reason ('concurrency_limit', 'queue_full', 'queue_timeout')
+            reason: Rejection reason
         """
-        async with self._lock:
-            self._total_rejected += 1
-            if reason == "concurrency_limit":
-                self._rejected_concurrency_limit += 1
-            elif reason == "queue_full":
-                self._rejected_queue_full += 1
-            elif reason == "queue_timeout":
-                self._rejected_queue_timeout += 1
-
-    async def get_metrics(self) -> BackpressureMetrics:
+        self._rejected[reason] += 1
+
+    def get_metrics(self) -> BackpressureMetrics:
         """
         Get current metrics snapshot.
 
+        The snapshot is consistent because no await separates the reads.
+
         Returns:
             BackpressureMetrics with current values
         """
-        async with self._lock:
-            return BackpressureMetrics(
-                active=self._active,
-                queued=self._queued,
-                total_rejected=self._total_rejected,
-                rejected_concurrency_limit=self._rejected_concurrency_limit,
-                rejected_queue_full=self._rejected_queue_full,
-                rejected_queue_timeout=self._rejected_queue_timeout,
-            )
+        rejected = self._rejected
+        return BackpressureMetrics(
+            active=self._active,
+            queued=len(self._waiters),
+            total_rejected=sum(rejected),
+            rejected_concurrency_limit=rejected[RejectReason.CONCURRENCY_LIMIT],
+            rejected_queue_full=rejected[RejectReason.QUEUE_FULL],
+            rejected_queue_timeout=rejected[RejectReason.QUEUE_TIMEOUT],
+        )
@@ -1,12 +1,21 @@
 """Backpressure middleware for FastMCP servers"""
 
 import asyncio
-import time
-from collections.abc import Awaitable, Callable
-from typing import Any
+import inspect
+import math
+from collections import deque
+from collections.abc import Callable
+from typing import Any, NoReturn
 
 from .errors import OverloadError
-from .metrics import BackpressureMetrics, MetricsTracker
+from .metrics import BackpressureMetrics, MetricsTracker, RejectReason
+
+_isawaitable = inspect.isawaitable
+_get_running_loop = asyncio.get_running_loop
+_CancelledError = asyncio.CancelledError
+
+# OverloadError.reason for each RejectReason
+_REASON_NAMES = ("concurrency_limit", "queue_full", "queue_timeout")
 
 
 class BackpressureMiddleware:
@@ -14,7 +23,7 @@ class BackpressureMiddleware:
     Middleware that limits concurrent request executions with optional queueing.
 
     Provides two-level limiting:
-    1. Semaphore for active execution slots (max_concurrent)
+    1. Counter of active execution slots (max_concurrent)
     2. Bounded queue for waiting requests (queue_size)
 
     When both limits are reached, new requests are rejected with OverloadError.
@@ -28,6 +37,21 @@ class BackpressureMiddleware:
         ))
     """
 
+    __slots__ = (
+        "_max_concurrent",
+        "_queue_size",
+        "_queue_timeout",
+        "_overload_error_code",
+        "on_overload",
+        "_queue_timeout_ms",
+        "_queue_timeout_delay",
+        "_overload_static",
+        "_metrics",
+        "_waiters",
+        # Keep instances weak-referenceable (e.g. frameworks holding middleware in a WeakSet)
+        "__weakref__",
+    )
+
     def __init__(
         self,
         max_concurrent: int,
@@ -42,29 +66,79 @@ class BackpressureMiddleware:
         Args:
             max_concurrent: Maximum number of concurrent request executions
             queue_size: Maximum queue size (0 = no queue, reject immediately)
-            queue_timeout: Maximum time to wait in queue (seconds)
+            queue_timeout: Maximum time to wait in queue (seconds);
+                math.inf waits indefinitely
             overload_error_code: JSON-RPC error code for overload errors
-            on_overload: Optional callback called on each overload
+            on_overload: Optional callback called on each overload. It runs
+                inline on the rejection path, so it must be fast and
+                non-blocking (e.g. append to a buffer drained elsewhere).
 
         Raises:
             ValueError: If max_concurrent < 1 or queue_size < 0
         """
         if max_concurrent < 1:
             raise ValueError(f"max_concurrent must be >= 1, got {max_concurrent}")
-        if queue_size < 0:
-            raise ValueError(f"queue_size must be >= 0, got {queue_size}")
-        if queue_timeout <= 0:
-            raise ValueError(f"queue_timeout must be > 0, got {queue_timeout}")
 
-        self.max_concurrent = max_concurrent
+        self._waiters: deque[asyncio.Future[bool]] = deque()
+        self._metrics = MetricsTracker(self._waiters)
+        # OverloadError arguments that are the same for every rejection;
+        # kept in sync by the setters below
+        self._overload_static: dict[str, Any] = {}
+
+        self._max_concurrent = max_concurrent
+        self._overload_static["max_concurrent"] = max_concurrent
         self.queue_size = queue_size
         self.queue_timeout = queue_timeout
         self.overload_error_code = overload_error_code
         self.on_overload = on_overload
 
-        self._semaphore = asyncio.Semaphore(max_concurrent)
-        self._metrics = MetricsTracker()
-        self._queue_semaphore = asyncio.Semaphore(queue_size) if queue_size > 0 else None
+    @property
+    def max_concurrent(self) -> int:
+        """Maximum number of concurrent request executions."""
+        return self._max_concurrent
+
+    @max_concurrent.setter
+    def max_concurrent(self, max_concurrent: int) -> None:
+        self.set_max_concurrent(max_concurrent)
+
+    @property
+    def queue_size(self) -> int:
+        """Maximum number of queued requests (0 = no queue)."""
+        return self._queue_size
+
+    @queue_size.setter
+    def queue_size(self, queue_size: int) -> None:
+        if queue_size < 0:
+            raise ValueError(f"queue_size must be >= 0, got {queue_size}")
+        self._queue_size = queue_size
+        self._overload_static["queue_size"] = queue_size
+
+    @property
+    def queue_timeout(self) -> float:
+        """Maximum time to wait in queue (seconds); math.inf waits indefinitely."""
+        return self._queue_timeout
+
+    @queue_timeout.setter
+    def queue_timeout(self, queue_timeout: float) -> None:
+        if queue_timeout <= 0:
+            raise ValueError(f"queue_timeout must be > 0, got {queue_timeout}")
+        self._queue_timeout = queue_timeout
+        # Both derived here so the timer and the payload always agree:
+        # no timer and queue_timeout_ms=0 mean no queue timeout
+        unbounded = math.isinf(queue_timeout)
+        self._queue_timeout_delay = None if unbounded else queue_timeout
+        self._queue_timeout_ms = 0 if unbounded else int(queue_timeout * 1000)
+        self._overload_static["queue_timeout_ms"] = self._queue_timeout_ms
+
+    @property
+    def overload_error_code(self) -> int:
+        """JSON-RPC error code for overload errors."""
+        return self._overload_error_code
+
+    @overload_error_code.setter
+    def overload_error_code(self, overload_error_code: int) -> None:
+        self._overload_error_code = overload_error_code
+        self._overload_static["code"] = overload_error_code
 
     @property
     def active(self) -> int:
@@ -74,40 +148,116 @@ class BackpressureMiddleware:
     @property
     def queued(self) -> int:
         """Get current number of queued requests."""
-        return self._metrics._queued
+        return len(self._waiters)
 
     def get_metrics(self) -> BackpressureMetrics:
         """
-        Get current metrics snapshot (synchronous).
-
-        Note: This is a synchronous method that returns cached counters.
-        For fully consistent metrics, use get_metrics_async().
+        Get current metrics snapshot.
 
         Returns:
             BackpressureMetrics with current values
         """
-        return BackpressureMetrics(
-            active=self._metrics._active,
-            queued=self._metrics._queued,
-            total_rejected=self._metrics._total_rejected,
-            rejected_concurrency_limit=self._metrics._rejected_concurrency_limit,
-            rejected_queue_full=self._metrics._rejected_queue_full,
-            rejected_queue_timeout=self._metrics._rejected_queue_timeout,
-        )
+        return self._metrics.get_metrics()
 
     async def get_metrics_async(self) -> BackpressureMetrics:
         """
-        Get current metrics snapshot (async, thread-safe).
+        Get current metrics snapshot (async).
+
+        Kept for API compatibility; equivalent to get_metrics().
 
         Returns:
             BackpressureMetrics with current values
         """
-        return await self._metrics.get_metrics()
+        return self._metrics.get_metrics()
+
+    def set_max_concurrent(self, max_concurrent: int) -> None:
+        """
+        Change the concurrency limit at runtime.
+
+        Raising the limit immediately hands the new slots to queued requests.
+        Lowering it takes effect as active requests finish; nothing running
+        is interrupted.
+
+        Args:
+            max_concurrent: New maximum number of concurrent request executions
+
+        Raises:
+            ValueError: If max_concurrent < 1
+        """
+        if max_concurrent < 1:
+            raise ValueError(f"max_concurrent must be >= 1, got {max_concurrent}")
+
+        self._max_concurrent = max_concurrent
+        self._overload_static["max_concurrent"] = max_concurrent
+        while self._waiters and self._metrics._active < max_concurrent:
+            # Take a new slot and pass it to the oldest waiter
+            self._metrics._active += 1
+            self._release()
+
+    def _release(self) -> None:
+        """
+        Release an execution slot.
+
+        If requests are waiting and the limit allows, the slot is handed
+        directly to the oldest one (FIFO), so the active count is unchanged
+        and a new arrival cannot take the slot first. Otherwise the active
+        counter is decremented.
+        """
+        waiters = self._waiters
+        metrics = self._metrics
+        while waiters and metrics._active <= self._max_concurrent:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        metrics._active -= 1
+
+    def _leave_queue(self, waiter: asyncio.Future[bool]) -> None:
+        """
+        Clean up after a queued request stopped waiting (timeout or cancel).
+
+        Args:
+            waiter: The request's waiter future
+        """
+        handed_over = waiter.done() and not waiter.cancelled() and waiter.result()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            # Already popped by _release(); pass on a slot handed to us
+            if handed_over:
+                self._release()
+
+    def _reject(self, reason: RejectReason) -> NoReturn:
+        """
+        Count a rejection, notify on_overload and raise the OverloadError.
+
+        Args:
+            reason: Rejection reason
+
+        Raises:
+            OverloadError: Always
+        """
+        metrics = self._metrics
+        # FIX BUG-3: Increment rejected BEFORE reading metrics
+        metrics.incr_rejected(reason)
+        error = OverloadError(
+            reason=_REASON_NAMES[reason],
+            active=metrics._active,
+            queued=len(self._waiters),
+            **self._overload_static,
+        )
+        on_overload = self.on_overload
+        if on_overload is not None:
+            try:
+                on_overload(error)
+            except Exception:
+                pass
+        raise error
 
     async def __call__(
         self,
         request: Any,
-        call_next: Callable[[Any], Awaitable[Any]],
+        call_next: Callable[[Any], Any],
     ) -> Any:
         """
         Process request with concurrency limiting and queueing.
@@ -118,9 +268,14 @@ class BackpressureMiddleware:
         - If queued == queue_size: reject with reason='queue_full'
         - If timeout in queue: reject with reason='queue_timeout'
 
+        Admission is a plain counter check with no await before it, so there
+        is no window between checking for a free slot and taking it.
+
         Args:
             request: The incoming request
-            call_next: Function to call next middleware/handler
+            call_next: Function to call next middleware/handler. May return
+                an awaitable or, for handlers that finish synchronously, the
+                response itself.
 
         Returns:
             Response from call_next
@@ -128,156 +283,63 @@ class BackpressureMiddleware:
         Raises:
             OverloadError: If limits are reached or queue timeout occurs
         """
-        # FIX BUG-1: Try non-blocking acquire to avoid race between locked() and acquire()
-        # Use Task-based approach: create task, yield, check if done
-        semaphore_acquired = False
-        queued_successfully = False
+        metrics = self._metrics
+        if metrics._active < self._max_concurrent:
+            # Fast path: free execution slot
+            metrics._active += 1
+            try:
+                result = call_next(request)
+                if _isawaitable(result):
+                    result = await result
+                return result
+            finally:
+                self._release()
+
+        waiters = self._waiters
+        if self._queue_size == 0:
+            # No queue configured, reject immediately
+            self._reject(RejectReason.CONCURRENCY_LIMIT)
+
+        if len(waiters) >= self._queue_size:
+            # Queue is full, reject immediately
+            self._reject(RejectReason.QUEUE_FULL)
+
+        # Take a queue slot: the waiter deque is the bounded queue
+        loop = _get_running_loop()
+        waiter = loop.create_future()
+        waiters.append(waiter)
+
+        # Wait for _release() to hand us an execution slot
+        queue_timeout = self._queue_timeout_delay
+        timeout_handle = None
+        if queue_timeout is not None:
+            timeout_handle = loop.call_later(queue_timeout, _expire_waiter, waiter)
+        try:
+            granted = await waiter
+        except _CancelledError:
+            # Request was cancelled while queued
+            self._leave_queue(waiter)
+            raise
+        finally:
+            if timeout_handle is not None:
+                timeout_handle.cancel()
 
-        acquire_task = asyncio.create_task(self._semaphore.acquire())
+        if not granted:
+            # Queue timeout expired
+            self._leave_queue(waiter)
+            self._reject(RejectReason.QUEUE_TIMEOUT)
 
-        # FIX EARLY-CANCEL LEAK: Wrap entire admission path in try/finally
+        # Slot was handed over by _release(): already counted as active
         try:
-            await asyncio.sleep(0)  # Yield to let task try to acquire
-
-            if acquire_task.done():
-                # Got semaphore immediately - fast path
-                semaphore_acquired = True
-            else:
-                # Semaphore not available immediately - cancel task and check queue
-                acquire_task.cancel()
-                try:
-                    await acquire_task
-                except asyncio.CancelledError:
-                    pass
-                # Semaphore not available, need to queue or reject
-                if self.queue_size == 0:
-                    # No queue configured, reject immediately
-                    # FIX BUG-3: Increment rejected BEFORE reading metrics
-                    await self._metrics.increment_rejected("concurrency_limit")
-                    metrics = await self._metrics.get_metrics()
-                    error = OverloadError(
-                        reason="concurrency_limit",
-                        active=metrics.active,
-                        max_concurrent=self.max_concurrent,
-                        queued=metrics.queued,
-                        queue_size=self.queue_size,
-                        queue_timeout_ms=int(self.queue_timeout * 1000),
-                        code=self.overload_error_code,
-                    )
-                    if self.on_overload:
-                        try:
-                            self.on_overload(error)
-                        except Exception:
-                            pass
-                    raise error
-
-                # Try to acquire queue slot
-                if self._queue_semaphore.locked():
-                    # Queue is full, reject immediately
-                    # FIX BUG-3: Increment rejected BEFORE reading metrics
-                    await self._metrics.increment_rejected("queue_full")
-                    metrics = await self._metrics.get_metrics()
-                    error = OverloadError(
-                        reason="queue_full",
-                        active=metrics.active,
-                        max_concurrent=self.max_concurrent,
-                        queued=metrics.queued,
-                        queue_size=self.queue_size,
-                        queue_timeout_ms=int(self.queue_timeout * 1000),
-                        code=self.overload_error_code,
-                    )
-                    if self.on_overload:
-                        try:
-                            self.on_overload(error)
-                        except Exception:
-                            pass
-                    raise error
-
-                # Acquire queue slot
-                await self._queue_semaphore.acquire()
-                await self._metrics.increment_queued()
-                queued_successfully = True
-
-            # Now try to acquire execution semaphore
-            start_time = time.monotonic()
-
-            try:
-                if not semaphore_acquired and queued_successfully:
-                    # We're queued, wait for semaphore with timeout
-                    remaining_timeout = self.queue_timeout - (time.monotonic() - start_time)
-                    if remaining_timeout <= 0:
-                        raise asyncio.TimeoutError()
-
-                    await asyncio.wait_for(
-                        self._semaphore.acquire(), timeout=remaining_timeout
-                    )
-
-                    # FIX BUG-2: Wrap entire queued execution in try/finally to prevent permit leak
-                    try:
-                        # Got semaphore, no longer queued
-                        await self._metrics.decrement_queued()
-                        self._queue_semaphore.release()
-                        queued_successfully = False
-
-                        # Execute
-                        await self._metrics.increment_active()
-                        try:
-                            return await call_next(request)
-                        finally:
-                            await self._metrics.decrement_active()
-                    finally:
-                        self._semaphore.release()
-
-                elif semaphore_acquired:
-                    # Fast path: already acquired semaphore
-                    try:
-                        await self._metrics.increment_active()
-                        try:
-                            return await call_next(request)
-                        finally:
-                            await self._metrics.decrement_active()
-                    finally:
-                        self._semaphore.release()
-
-            except asyncio.TimeoutError:
-                # Queue timeout expired
-                if queued_successfully:
-                    await self._metrics.decrement_queued()
-                    self._queue_semaphore.release()
-
-                # FIX BUG-3: Increment rejected BEFORE reading metrics
-                await self._metrics.increment_rejected("queue_timeout")
-                metrics = await self._metrics.get_metrics()
-                error = OverloadError(
-                    reason="queue_timeout",
-                    active=metrics.active,
-                    max_concurrent=self.max_concurrent,
-                    queued=metrics.queued,
-                    queue_size=self.queue_size,
-                    queue_timeout_ms=int(self.queue_timeout * 1000),
-                    code=self.overload_error_code,
-                )
-                if self.on_overload:
-                    try:
-                        self.on_overload(error)
-                    except Exception:
-                        pass
-                raise error from None
-
-            except asyncio.CancelledError:
-                # Request was cancelled
-                if queued_successfully:
-                    await self._metrics.decrement_queued()
-                    self._queue_semaphore.release()
-                raise
+            result = call_next(request)
+            if _isawaitable(result):
+                result = await result
+            return result
         finally:
-            # FIX EARLY-CANCEL LEAK: Release semaphore if acquired but not used
-            if acquire_task.done() and not semaphore_acquired:
-                try:
-                    # Check if task completed successfully (acquired semaphore)
-                    acquire_task.result()
-                    # If we get here, task completed successfully but we didn't track it
-                    self._semaphore.release()
-                except (asyncio.CancelledError, Exception):
-                    # Task was cancelled or failed, no semaphore to release
-                    pass
+            self._release()
+
+
+def _expire_waiter(waiter: asyncio.Future[bool]) -> None:
+    """Resolve a queued request's waiter as timed out, unless already resolved."""
+    if not waiter.done():
+        waiter.set_result(False)
@@ -7,8 +7,17 @@ import asyncio
 from collections.abc import Awaitable, Callable
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
+from types import MappingProxyType
 from typing import Any
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Shared read-only request passed through the middleware by tests
+FAKE_REQUEST = MappingProxyType({"type": "tool_call"})
+
 # =============================================================================
 # BARRIER TOOL - deterministic "hold and release" for concurrency tests
 # =============================================================================
@@ -18,39 +27,39 @@ class BarrierTool:
     """
     Deterministic tool for concurrency tests.
     Holds execution until explicitly released.
+
+    Counters are updated without a lock: asyncio runs one coroutine at a
+    time and there is no await between reading and writing them.
     """
     entered: int = 0
     max_seen: int = 0
     _active: int = 0
 
-    _lock: asyncio.Lock = field(default_factory=asyncio.Lock)
     _entered_event: asyncio.Event = field(default_factory=asyncio.Event)
     _release_event: asyncio.Event = field(default_factory=asyncio.Event)
 
     async def __call__(self) -> dict:
-        async with self._lock:
-            self.entered += 1
-            self._active += 1
-            if self._active > self.max_seen:
-                self.max_seen = self._active
-            self._entered_event.set()
+        self.entered += 1
+        self._active += 1
+        if self._active > self.max_seen:
+            self.max_seen = self._active
+        self._entered_event.set()
 
         try:
             await self._release_event.wait()
             return {"ok": True}
         finally:
-            async with self._lock:
-                self._active -= 1
+            self._active -= 1
 
     async def wait_entered_at_least(self, n: int, timeout: float = 2.0) -> None:
-        end = asyncio.get_running_loop().time() + timeout
+        now = asyncio.get_running_loop().time
+        end = now() + timeout
         while True:
-            async with self._lock:
-                if self.entered >= n:
-                    return
-                self._entered_event.clear()
+            if self.entered >= n:
+                return
+            self._entered_event.clear()
 
-            remaining = end - asyncio.get_running_loop().time()
+            remaining = end - now()
             if remaining <= 0:
                 raise TimeoutError(f"Timeout waiting for entered >= {n}, got {self.entered}")
 
@@ -63,8 +72,7 @@ class BarrierTool:
         self._release_event.set()
 
     async def get_active(self) -> int:
-        async with self._lock:
-            return self._active
+        return self._active
 
     def reset(self) -> None:
         self.entered = 0
@@ -130,16 +138,48 @@ async def burst(
             if 0 <= i < len(tasks):
                 tasks[i].cancel()
 
-    results: list[CallResult] = []
+    # Cancelled tasks come back as CancelledError instances
+    raw = await asyncio.gather(*tasks, return_exceptions=True)
+    return [
+        CallResult(ok=False, exc=r) if isinstance(r, BaseException) else CallResult(ok=True, value=r)
+        for r in raw
+    ]
+
+
+async def drain(tasks: list[asyncio.Task]) -> list[Any]:
+    """
+    Cancel tasks and wait for all of them in one gather.
+
+    Returns each task's result or exception (including CancelledError).
+    """
     for t in tasks:
-        try:
-            v = await t
-            results.append(CallResult(ok=True, value=v))
-        except asyncio.CancelledError as e:
-            results.append(CallResult(ok=False, exc=e))
-        except BaseException as e:
-            results.append(CallResult(ok=False, exc=e))
+        t.cancel()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_requests(
+    call: Callable[[], Awaitable[Any]],
+    total: int,
+    *,
+    concurrency: int,
+) -> list[CallResult]:
+    """
+    Make total calls from a fixed pool of concurrency worker tasks.
+
+    Keeps up to concurrency calls in flight with one task per worker
+    instead of one per call. Results are in completion order.
+    """
+    remaining = iter(range(total))
+    results: list[CallResult] = []
+
+    async def worker() -> None:
+        for _ in remaining:
+            try:
+                results.append(CallResult(ok=True, value=await call()))
+            except Exception as e:
+                results.append(CallResult(ok=False, exc=e))
 
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
     return results
 
 
@@ -164,20 +204,23 @@ class PermitLeakDetector:
 
     async def assert_clean(self, timeout: float = 1.0, msg: str = "Permit leak detected") -> None:
         """Assert that active=0 and queued=0 after test."""
-        end = asyncio.get_running_loop().time() + timeout
+        now = asyncio.get_running_loop().time
+        end = now() + timeout
+        delay = 0.0
 
         while True:
             metrics = self._get_metrics()
             if metrics["active"] == 0 and metrics["queued"] == 0:
                 return
 
-            if asyncio.get_running_loop().time() >= end:
+            if now() >= end:
                 raise AssertionError(
                     f"{msg}: active={metrics['active']}, queued={metrics['queued']} "
                     f"(expected both 0)"
                 )
 
-            await asyncio.sleep(0.01)
+            await asyncio.sleep(delay)
+            delay = _next_delay(delay, 0.01)
 
     def _get_metrics(self) -> dict:
         """Get metrics from middleware. Adapt to your API."""
@@ -229,13 +272,51 @@ async def assert_eventually(
     Assert async predicate becomes True within timeout.
     Use sparingly - prefer deterministic waits.
     """
-    end = asyncio.get_running_loop().time() + timeout
+    now = asyncio.get_running_loop().time
+    end = now() + timeout
+    delay = 0.0
     while True:
         if await pred():
             return
-        if asyncio.get_running_loop().time() >= end:
+        if now() >= end:
             raise AssertionError(f"{msg} within {timeout}s")
-        await asyncio.sleep(tick)
+        await asyncio.sleep(delay)
+        delay = _next_delay(delay, tick)
+
+
+async def wait_state(
+    mw,
+    *,
+    active: int | None = None,
+    queued: int | None = None,
+    timeout: float = 1.0,
+) -> None:
+    """
+    Wait until the middleware reports the given active/queued counts.
+
+    Returns as soon as the state is reached instead of sleeping a fixed time.
+    Counts left as None are not checked.
+    """
+    now = asyncio.get_running_loop().time
+    end = now() + timeout
+    delay = 0.0
+    while True:
+        if (active is None or mw.active == active) and (queued is None or mw.queued == queued):
+            return
+        if now() >= end:
+            raise AssertionError(
+                f"Expected active={active}, queued={queued} within {timeout}s, "
+                f"got active={mw.active}, queued={mw.queued}"
+            )
+        await asyncio.sleep(delay)
+        delay = _next_delay(delay, 0.01)
+
+
+def _next_delay(delay: float, tick: float) -> float:
+    """
+    Exponential poll backoff: first just yield (0), then 1ms doubling up to tick.
+    """
+    return min(max(delay * 2, 0.001), tick)
 
 
 # =============================================================================
@@ -244,6 +325,13 @@ async def assert_eventually(
 
 import pytest
 
+if uvloop is not None:
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_asyncio_loop_factories(config, item):
+        """Run tests on uvloop when it is installed, else the default asyncio loop."""
+        return {"uvloop": uvloop.new_event_loop}
+
 
 @pytest.fixture
 def barrier_tool():
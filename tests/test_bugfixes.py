@@ -8,11 +8,12 @@ Tests for:
 """
 
 import asyncio
+import itertools
 
 import pytest
 
 from mcp_backpressure import BackpressureMiddleware, OverloadError
-from tests.conftest import BarrierTool
+from tests.conftest import FAKE_REQUEST, BarrierTool, drain, wait_state
 
 
 @pytest.mark.asyncio
@@ -35,8 +36,7 @@ async def test_bug1_no_race_condition_with_queue_full():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active slots
     active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
@@ -45,7 +45,7 @@ async def test_bug1_no_race_condition_with_queue_full():
 
     # Fill queue
     queued_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=2)
     assert mw.queued == 2
 
     # Release one active slot
@@ -64,47 +64,30 @@ async def test_bug1_no_race_condition_with_queue_full():
     ), "Request should not be rejected when slot becomes available"
 
     # Cleanup
-    new_task.cancel()
-    for task in active_tasks + queued_tasks:
-        task.cancel()
-        try:
-            await task
-        except (asyncio.CancelledError, OverloadError):
-            pass
+    await drain([new_task, *active_tasks, *queued_tasks])
 
 
 @pytest.mark.asyncio
 async def test_bug2_no_permit_leak_on_exception_in_queued_path():
     """
-    BUG-2: Permit leak when exception occurs between acquire() and try block.
+    BUG-2: Permit leak when exception occurs in the queued path.
 
-    Test that semaphore is properly released even if exception happens
-    after acquire() but before the main try/finally block in queued path.
+    Test that the execution slot handed to a queued request is released
+    even if that request fails after being promoted.
 
-    We simulate this by causing an exception in metrics operations.
+    We simulate this by raising from the promoted request's handler.
     """
     mw = BackpressureMiddleware(max_concurrent=2, queue_size=2, queue_timeout=1.0)
-
-    # Mock metrics to cause exception
-    original_increment = mw._metrics.increment_active
-    call_count = [0]
-
-    async def failing_increment():
-        call_count[0] += 1
-        if call_count[0] == 3:  # Fail on 3rd call (first queued request promoted)
-            raise RuntimeError("Simulated exception in increment_active")
-        await original_increment()
-
-    mw._metrics.increment_active = failing_increment
-
     barrier_tool = BarrierTool()
+    call_numbers = itertools.count(1)
 
     async def call_next(request):
+        if next(call_numbers) == 3:  # Fail on 3rd call (first queued request promoted)
+            raise RuntimeError("Simulated exception in queued path")
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active slots
     active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
@@ -113,183 +96,100 @@ async def test_bug2_no_permit_leak_on_exception_in_queued_path():
 
     # Queue one request
     queued_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=1)
     assert mw.queued == 1
 
     # Release barrier to let active tasks finish
     barrier_tool.release()
 
     # Wait for tasks to complete
-    for task in active_tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*active_tasks, return_exceptions=True)
 
     # Wait for queued task to fail
-    try:
+    with pytest.raises(RuntimeError, match="Simulated exception"):
         await queued_task
-        pytest.fail("Expected RuntimeError from failing_increment")
-    except RuntimeError as e:
-        assert "Simulated exception" in str(e)
 
     # KEY TEST: Verify no permit leak - active should be 0
-    # With BUG-2, semaphore would not be released and active would be stuck > 0
-    await asyncio.sleep(0.1)
+    # With BUG-2, the slot would not be released and active would be stuck > 0
+    await wait_state(mw, active=0)
     assert mw.active == 0, f"Permit leak detected: active={mw.active}, expected 0"
 
 
+async def _reject_incoming(make_request, count):
+    """Send new requests that are rejected on arrival."""
+    errors = []
+    for _ in range(count):
+        with pytest.raises(OverloadError) as exc_info:
+            await make_request()
+        errors.append(exc_info.value)
+    return errors
+
+
+async def _reject_queued(mw, queued_tasks):
+    """Let the queued requests' waits run into the queue timeout."""
+    await wait_state(mw, queued=0)
+    return await asyncio.gather(*queued_tasks, return_exceptions=True)
+
+
 @pytest.mark.asyncio
-async def test_bug3_metrics_updated_before_error_creation():
+@pytest.mark.parametrize(
+    ("reason", "mw_kwargs", "count"),
+    [
+        ("concurrency_limit", {"max_concurrent": 2, "queue_size": 0}, 3),
+        ("queue_full", {"max_concurrent": 2, "queue_size": 1}, 1),
+        ("queue_timeout", {"max_concurrent": 1, "queue_size": 1, "queue_timeout": 0.1}, 1),
+    ],
+    ids=["concurrency_limit", "queue_full", "queue_timeout"],
+)
+async def test_bug3_metrics_updated_before_error_creation(reason, mw_kwargs, count):
     """
     BUG-3: TOCTOU race - metrics read before rejected increment.
 
     Test that rejected counters are incremented BEFORE reading metrics
     for error creation, so the error contains correct/updated counts.
+    Covers every rejection reason.
     """
-    mw = BackpressureMiddleware(max_concurrent=2, queue_size=0)
+    mw = BackpressureMiddleware(**mw_kwargs)
     barrier_tool = BarrierTool()
 
     async def call_next(request):
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
-    # Fill active slots
-    active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
-    await barrier_tool.wait_entered_at_least(2, timeout=2.0)
-    assert mw.active == 2
+    # Fill active slots, then the queue
+    active_tasks = [asyncio.create_task(make_request()) for _ in range(mw.max_concurrent)]
+    await barrier_tool.wait_entered_at_least(mw.max_concurrent, timeout=2.0)
+    queued_tasks = [asyncio.create_task(make_request()) for _ in range(mw.queue_size)]
+    await wait_state(mw, active=mw.max_concurrent, queued=mw.queue_size)
 
-    # Try to make requests that will be rejected
-    rejected_errors = []
-    for _ in range(3):
-        try:
-            await make_request()
-            pytest.fail("Expected OverloadError")
-        except OverloadError as e:
-            rejected_errors.append(e)
+    if reason == "queue_timeout":
+        rejected_errors = await _reject_queued(mw, queued_tasks)
+    else:
+        rejected_errors = await _reject_incoming(make_request, count)
 
     # KEY TEST: Verify that rejected count is correct after all rejections
     # With BUG-3, metrics would be read BEFORE increment, leading to incorrect counts
-
-    # Check final metrics
-    final_metrics = mw.get_metrics()
-    assert final_metrics.total_rejected == 3, (
-        f"Expected total_rejected=3, got {final_metrics.total_rejected}"
+    metrics = mw.get_metrics()
+    assert metrics.total_rejected == count, (
+        f"Expected total_rejected={count}, got {metrics.total_rejected}"
     )
-    assert final_metrics.rejected_concurrency_limit == 3, (
-        f"Expected rejected_concurrency_limit=3, got {final_metrics.rejected_concurrency_limit}"
+    assert getattr(metrics, f"rejected_{reason}") == count, (
+        f"Expected rejected_{reason}={count}, got {getattr(metrics, f'rejected_{reason}')}"
     )
 
-    # Each error should have consistent active/queued counts (not checking rejected in error.data
-    # because it's not included there, but the fix ensures metrics are updated before error creation)
+    # Each error should have consistent active counts (the fix ensures
+    # metrics are updated before error creation)
+    assert len(rejected_errors) == count
     for error in rejected_errors:
-        assert error.reason == "concurrency_limit"
-        assert error.active == 2  # Both slots were active when rejected
-
-    # Cleanup
-    barrier_tool.release()
-    for task in active_tasks:
-        try:
-            await task
-        except Exception:
-            pass
-
-
-@pytest.mark.asyncio
-async def test_bug3_queue_full_metrics():
-    """
-    BUG-3: Test metrics for queue_full rejections.
-    """
-    mw = BackpressureMiddleware(max_concurrent=2, queue_size=1)
-    barrier_tool = BarrierTool()
-
-    async def call_next(request):
-        return await barrier_tool()
-
-    async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
-
-    # Fill active and queue
-    active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
-    await barrier_tool.wait_entered_at_least(2, timeout=2.0)
-
-    queued_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.1)
-    assert mw.queued == 1
-
-    # Try to queue more - should get queue_full
-    try:
-        await make_request()
-        pytest.fail("Expected OverloadError with queue_full")
-    except OverloadError as e:
-        assert e.reason == "queue_full"
-
-    # Check metrics were updated correctly
-    metrics = mw.get_metrics()
-    assert metrics.total_rejected == 1, f"Expected total_rejected=1, got {metrics.total_rejected}"
-    assert metrics.rejected_queue_full == 1, (
-        f"Expected rejected_queue_full=1, got {metrics.rejected_queue_full}"
-    )
-
-    # Cleanup
-    barrier_tool.release()
-    for task in active_tasks + [queued_task]:
-        try:
-            await task
-        except Exception:
-            pass
-
-
-@pytest.mark.asyncio
-async def test_bug3_queue_timeout_metrics():
-    """
-    BUG-3: Test metrics for queue_timeout rejections.
-    """
-    mw = BackpressureMiddleware(max_concurrent=1, queue_size=1, queue_timeout=0.1)
-    barrier_tool = BarrierTool()
-
-    async def call_next(request):
-        return await barrier_tool()
-
-    async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
-
-    # Fill active
-    active_task = asyncio.create_task(make_request())
-    await barrier_tool.wait_entered_at_least(1, timeout=2.0)
-
-    # Queue one that will timeout
-    queued_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.05)
-    assert mw.queued == 1
-
-    # Wait for timeout
-    try:
-        await queued_task
-        pytest.fail("Expected OverloadError with queue_timeout")
-    except OverloadError as e:
-        assert e.reason == "queue_timeout"
-
-    # Check metrics were updated correctly
-    metrics = mw.get_metrics()
-    assert metrics.total_rejected == 1, (
-        f"Expected total_rejected=1, got {metrics.total_rejected}"
-    )
-    assert metrics.rejected_queue_timeout == 1, (
-        f"Expected rejected_queue_timeout=1, got {metrics.rejected_queue_timeout}"
-    )
+        assert isinstance(error, OverloadError)
+        assert error.reason == reason
+        assert error.active == mw.max_concurrent  # All slots were active when rejected
 
     # Cleanup
     barrier_tool.release()
-    try:
-        await active_task
-    except Exception:
-        pass
+    await asyncio.gather(*active_tasks, *queued_tasks, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -297,46 +197,48 @@ async def test_cancel_during_sleep_no_leak():
     """
     EARLY-CANCEL LEAK: Semaphore leak when cancelled during admission.
 
-    Test that if a request is cancelled during the sleep(0) after
-    acquire_task.done() == True, the semaphore is properly released.
+    Test that if a request is cancelled while waiting for an execution slot
+    or while holding one, the slot is properly released.
 
-    Without the fix, the semaphore would be acquired but not tracked,
+    Without the fix, the slot would be taken but not tracked,
     causing a permanent leak.
     """
-    mw = BackpressureMiddleware(max_concurrent=2, queue_size=0)
+    mw = BackpressureMiddleware(max_concurrent=1, queue_size=1, queue_timeout=5.0)
 
     # Track calls to verify timing
-    call_count = [0]
+    call_count = 0
+    entered = asyncio.Event()
 
     async def call_next(request):
-        call_count[0] += 1
+        nonlocal call_count
+        call_count += 1
+        if call_count == 1:
+            # First admitted request holds its slot until cancelled
+            entered.set()
+            await asyncio.Event().wait()
         return {"result": "ok"}
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
-
-    # Make a request and cancel it immediately
-    # This tries to hit the race where semaphore is acquired but task is cancelled
-    for _ in range(10):  # Try multiple times to increase chance of hitting race
-        task = asyncio.create_task(make_request())
-        await asyncio.sleep(0)  # Let it start
-        task.cancel()
-        try:
-            await task
-        except asyncio.CancelledError:
-            pass
+        return await mw(FAKE_REQUEST, call_next)
+
+    # Cancel one request while it holds a slot and one while it waits for
+    # one. Both points are reached deterministically, so no retry loop is needed.
+    holding = asyncio.create_task(make_request())
+    await entered.wait()
+    waiting = asyncio.create_task(make_request())
+    await wait_state(mw, active=1, queued=1)
+    waiting.cancel()
+    holding.cancel()
+    results = await asyncio.gather(waiting, holding, return_exceptions=True)
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+    assert call_count == 1
 
     # KEY TEST: Verify no semaphore leak - should be able to make new requests
     # If there's a leak, semaphore would be exhausted and new requests would hang/fail
-    await asyncio.sleep(0.1)
+    await wait_state(mw, active=0, queued=0)
 
     # Try to make max_concurrent requests - they should all succeed
-    successful_tasks = []
-    for _ in range(mw.max_concurrent):
-        task = asyncio.create_task(make_request())
-        successful_tasks.append(task)
-        await asyncio.sleep(0.05)
+    successful_tasks = [asyncio.create_task(make_request()) for _ in range(mw.max_concurrent)]
 
     # Wait for all to complete
     results = await asyncio.gather(*successful_tasks)
@@ -344,5 +246,5 @@ async def test_cancel_during_sleep_no_leak():
     assert all(r == {"result": "ok"} for r in results)
 
     # Verify active count is correct
-    await asyncio.sleep(0.05)
+    await wait_state(mw, active=0)
     assert mw.active == 0, f"Active count incorrect: {mw.active}, expected 0"
@@ -9,7 +9,7 @@ import asyncio
 import pytest
 
 from mcp_backpressure import BackpressureMiddleware
-from tests.conftest import BarrierTool
+from tests.conftest import FAKE_REQUEST, BarrierTool, drain, wait_state
 
 
 @pytest.fixture
@@ -34,8 +34,7 @@ async def test_cancel_while_queued_frees_slot(middleware: BackpressureMiddleware
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Fill active slots (max_concurrent=2)
     active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
@@ -47,7 +46,7 @@ async def test_cancel_while_queued_frees_slot(middleware: BackpressureMiddleware
 
     # Queue one request (will wait in queue)
     queued_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=2, queued=1)
 
     # Verify queued
     assert middleware.queued == 1
@@ -57,14 +56,11 @@ async def test_cancel_while_queued_frees_slot(middleware: BackpressureMiddleware
     queued_task.cancel()
 
     # Wait for cancellation to propagate
-    try:
+    with pytest.raises(asyncio.CancelledError):
         await queued_task
-        pytest.fail("Expected CancelledError")
-    except asyncio.CancelledError:
-        pass
 
-    # Give middleware time to clean up
-    await asyncio.sleep(0.1)
+    # Wait for middleware to clean up
+    await wait_state(middleware, queued=0)
 
     # Verify queued counter decremented (slot freed)
     assert middleware.queued == 0, (
@@ -73,28 +69,20 @@ async def test_cancel_while_queued_frees_slot(middleware: BackpressureMiddleware
 
     # Verify another request can take the freed queue slot
     new_queued_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, queued=1)
 
     assert middleware.queued == 1, (
         "New request should queue successfully after cancel freed slot"
     )
 
     # Cleanup
-    new_queued_task.cancel()
-    try:
-        await new_queued_task
-    except asyncio.CancelledError:
-        pass
+    await drain([new_queued_task])
 
     barrier_tool.release()
-    for task in active_tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*active_tasks, return_exceptions=True)
 
     # Verify no leaks
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=0, queued=0)
     assert middleware.active == 0, f"Active leak: {middleware.active}"
     assert middleware.queued == 0, f"Queue leak: {middleware.queued}"
 
@@ -117,8 +105,7 @@ async def test_cancel_while_active_decrements_counter(
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Fill active slots
     active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
@@ -128,7 +115,7 @@ async def test_cancel_while_active_decrements_counter(
 
     # Queue one request (will wait)
     queued_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, queued=1)
 
     assert middleware.queued == 1
 
@@ -136,14 +123,11 @@ async def test_cancel_while_active_decrements_counter(
     active_tasks[0].cancel()
 
     # Wait for cancellation
-    try:
+    with pytest.raises(asyncio.CancelledError):
         await active_tasks[0]
-        pytest.fail("Expected CancelledError")
-    except asyncio.CancelledError:
-        pass
 
-    # Give middleware time to clean up and promote queued request
-    await asyncio.sleep(0.1)
+    # Wait for middleware to clean up and promote queued request
+    await wait_state(middleware, queued=0)
 
     # Active counter should have decremented then incremented (queued promoted)
     # So still at 2 (one cancelled, one promoted from queue)
@@ -167,7 +151,7 @@ async def test_cancel_while_active_decrements_counter(
         pass
 
     # Verify no leaks
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=0, queued=0)
     assert middleware.active == 0
     assert middleware.queued == 0
 
@@ -186,8 +170,7 @@ async def test_no_permit_leak_on_cancel():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active slots
     active_tasks = [asyncio.create_task(make_request()) for _ in range(3)]
@@ -197,7 +180,7 @@ async def test_no_permit_leak_on_cancel():
 
     # Queue several requests
     queued_tasks = [asyncio.create_task(make_request()) for _ in range(5)]
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=5)
 
     assert mw.queued == 5
 
@@ -212,7 +195,7 @@ async def test_no_permit_leak_on_cancel():
         except asyncio.CancelledError:
             pass
 
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=2)
 
     # Queued should be decremented by 3
     assert mw.queued == 2, f"Expected queued=2 after 3 cancels, got {mw.queued}"
@@ -224,7 +207,7 @@ async def test_no_permit_leak_on_cancel():
     except asyncio.CancelledError:
         pass
 
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=1)
 
     # One queued should be promoted to active
     assert mw.queued == 1, (
@@ -235,14 +218,10 @@ async def test_no_permit_leak_on_cancel():
     barrier_tool.release()
 
     # Wait for all remaining tasks
-    for task in active_tasks + queued_tasks:
-        try:
-            await task
-        except (asyncio.CancelledError, Exception):
-            pass
+    await asyncio.gather(*active_tasks, *queued_tasks, return_exceptions=True)
 
     # Verify clean state
-    await asyncio.sleep(0.2)
+    await wait_state(mw, active=0, queued=0)
     assert mw.active == 0, f"Active leak: {mw.active}"
     assert mw.queued == 0, f"Queue leak: {mw.queued}"
 
@@ -259,8 +238,7 @@ async def test_cancel_before_acquiring_semaphore():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active slot
     active_task = asyncio.create_task(make_request())
@@ -268,39 +246,32 @@ async def test_cancel_before_acquiring_semaphore():
 
     # Queue request
     queued_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.05)
+    await wait_state(mw, queued=1)
 
     assert mw.queued == 1
 
     # Cancel immediately (before semaphore acquired)
     queued_task.cancel()
 
-    try:
+    with pytest.raises(asyncio.CancelledError):
         await queued_task
-        pytest.fail("Expected CancelledError")
-    except asyncio.CancelledError:
-        pass
 
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=0)
 
     # Verify queue freed
     assert mw.queued == 0
 
     # Verify new request can queue
     new_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.05)
+    await wait_state(mw, queued=1)
 
     assert mw.queued == 1
 
     # Cleanup
     barrier_tool.release()
-    for task in [active_task, new_task]:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(active_task, new_task, return_exceptions=True)
 
-    await asyncio.sleep(0.1)
+    await wait_state(mw, active=0, queued=0)
     assert mw.active == 0
     assert mw.queued == 0
 
@@ -317,8 +288,7 @@ async def test_multiple_cancellations_preserve_invariants():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active
     active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
@@ -326,7 +296,7 @@ async def test_multiple_cancellations_preserve_invariants():
 
     # Fill queue
     queued_tasks = [asyncio.create_task(make_request()) for _ in range(8)]
-    await asyncio.sleep(0.1)
+    await wait_state(mw, active=2, queued=8)
 
     assert mw.active == 2
     assert mw.queued == 8
@@ -343,7 +313,7 @@ async def test_multiple_cancellations_preserve_invariants():
         except asyncio.CancelledError:
             pass
 
-    await asyncio.sleep(0.1)
+    await wait_state(mw, active=2, queued=4)
 
     # Verify counters
     assert mw.queued == 4, f"Expected queued=4 after 4 cancels, got {mw.queued}"
@@ -351,12 +321,59 @@ async def test_multiple_cancellations_preserve_invariants():
 
     # Cleanup
     barrier_tool.release()
-    for task in active_tasks + queued_tasks:
-        try:
-            await task
-        except (asyncio.CancelledError, Exception):
-            pass
+    await asyncio.gather(*active_tasks, *queued_tasks, return_exceptions=True)
 
-    await asyncio.sleep(0.2)
+    await wait_state(mw, active=0, queued=0)
     assert mw.active == 0
     assert mw.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_right_after_slot_handoff_no_leak():
+    """
+    Test cancellation of a queued request just after a slot was handed to it.
+
+    The released slot must either be used by the cancelled request or passed
+    on to the next waiter - never stranded.
+    """
+    mw = BackpressureMiddleware(max_concurrent=1, queue_size=2, queue_timeout=5.0)
+    barrier_tool = BarrierTool()
+    first_done = asyncio.Event()
+
+    async def call_next(request):
+        if request["id"] == 0:
+            await first_done.wait()
+            return {"ok": True}
+        return await barrier_tool()
+
+    async def make_request(request_id):
+        return await mw({"type": "tool_call", "id": request_id}, call_next)
+
+    # Fill active slot, then queue two requests
+    active_task = asyncio.create_task(make_request(0))
+    await asyncio.sleep(0)
+    queued_tasks = [asyncio.create_task(make_request(i)) for i in (1, 2)]
+    await wait_state(mw, active=1, queued=2)
+
+    assert mw.active == 1
+    assert mw.queued == 2
+
+    # Finish the active request; its slot is handed to the first waiter
+    first_done.set()
+    await wait_state(mw, queued=1)
+
+    # Cancel the promoted request before it gets to run
+    queued_tasks[0].cancel()
+
+    barrier_tool.release()
+    await active_task
+    results = await asyncio.gather(*queued_tasks, return_exceptions=True)
+
+    # The promoted request was cancelled; the second waiter must still
+    # get a slot and complete
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1] == {"ok": True}
+
+    await wait_state(mw, active=0, queued=0)
+    assert mw.active == 0, f"Active leak: {mw.active}"
+    assert mw.queued == 0, f"Queue leak: {mw.queued}"
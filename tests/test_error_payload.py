@@ -8,7 +8,7 @@ import json
 
 import pytest
 
-from mcp_backpressure import OverloadError
+from mcp_backpressure import OverloadError, errors
 
 
 def test_error_is_json_serializable():
@@ -243,6 +243,10 @@ def test_error_string_representation():
     assert "SERVER_OVERLOADED" in error_str
     assert "queue_full" in error_str
 
+    # args and repr() carry the message and reason for logs and tracebacks
+    assert error.args == ("SERVER_OVERLOADED", "queue_full")
+    assert repr(error) == "OverloadError('SERVER_OVERLOADED', 'queue_full')"
+
 
 def test_error_complete_payload_example():
     """
@@ -332,3 +336,72 @@ def test_all_reason_values_in_payload():
         # Verify serializable
         serialized = json.dumps(json_rpc)
         assert isinstance(serialized, str)
+
+
+@pytest.mark.parametrize("encoder", ["stdlib", "orjson"])
+def test_to_json_bytes(monkeypatch, encoder):
+    """
+    Test to_json_bytes() with both the orjson path and the stdlib fallback.
+
+    Uses a non-ASCII message: both encoders must emit the same compact
+    output with raw UTF-8, not escapes.
+    """
+    if encoder == "orjson":
+        orjson = pytest.importorskip("orjson")
+        monkeypatch.setattr(errors, "_dumps", orjson.dumps)
+    else:
+        monkeypatch.setattr(errors, "_dumps", errors._dumps_stdlib)
+
+    error = OverloadError(
+        reason="queue_timeout",
+        active=2,
+        max_concurrent=2,
+        queued=1,
+        queue_size=3,
+        queue_timeout_ms=300,
+        message="Überlastet",
+    )
+
+    encoded = error.to_json_bytes()
+    assert isinstance(encoded, bytes)
+    assert encoded == json.dumps(
+        error.to_json_rpc(), separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+    assert "Überlastet".encode() in encoded
+    assert json.loads(encoded)["message"] == "Überlastet"
+    # Encoded once, then reused
+    assert error.to_json_bytes() is error.to_json_bytes()
+
+
+def test_payload_copies_are_independent():
+    """
+    Test that mutating to_json_rpc() or data results does not leak into the
+    error or its serialized bytes.
+    """
+    error = OverloadError(reason="queue_full", active=5, max_concurrent=5)
+    encoded = error.to_json_bytes()
+
+    json_rpc = error.to_json_rpc()
+    json_rpc["id"] = 7
+    json_rpc["data"]["active"] = 0
+    error.data["queued"] = 99
+
+    assert "id" not in error.to_json_rpc()
+    assert error.to_json_rpc()["data"]["active"] == 5
+    assert error.data["queued"] == 0
+    assert error.to_json_bytes() == encoded
+    assert json.loads(encoded) == error.to_json_rpc()
+
+
+def test_payload_reflects_attribute_changes():
+    """
+    Test that to_json_rpc() is built from the current attributes, so an
+    on_overload hook can adjust fields such as retry_after_ms.
+    """
+    error = OverloadError(reason="queue_full", active=5, max_concurrent=5)
+
+    error.retry_after_ms = 5000
+
+    assert error.data["retry_after_ms"] == 5000
+    assert error.to_json_rpc()["data"]["retry_after_ms"] == 5000
+    assert json.loads(error.to_json_bytes())["data"]["retry_after_ms"] == 5000
@@ -9,7 +9,7 @@ import asyncio
 import pytest
 
 from mcp_backpressure import BackpressureMetrics, BackpressureMiddleware, OverloadError
-from tests.conftest import BarrierTool
+from tests.conftest import FAKE_REQUEST, BarrierTool, wait_state
 
 
 @pytest.fixture
@@ -33,8 +33,7 @@ async def test_metrics_after_burst_returns_to_zero(
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Launch burst of N+Q requests
     N = middleware.max_concurrent
@@ -43,7 +42,7 @@ async def test_metrics_after_burst_returns_to_zero(
 
     # Wait for N to be active
     await barrier_tool.wait_entered_at_least(N, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=N, queued=Q)
 
     # Verify during execution
     metrics = middleware.get_metrics()
@@ -71,8 +70,7 @@ async def test_metrics_track_active_correctly(middleware: BackpressureMiddleware
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Start with 0
     metrics = middleware.get_metrics()
@@ -107,8 +105,7 @@ async def test_metrics_track_queued_correctly(middleware: BackpressureMiddleware
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Start with 0
     metrics = middleware.get_metrics()
@@ -117,7 +114,7 @@ async def test_metrics_track_queued_correctly(middleware: BackpressureMiddleware
     # Fill active + queue some
     tasks = [asyncio.create_task(make_request()) for _ in range(N + 3)]
     await barrier_tool.wait_entered_at_least(N, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=N, queued=3)
 
     # Should show 3 queued
     metrics = middleware.get_metrics()
@@ -145,8 +142,7 @@ async def test_metrics_track_rejected_counts(middleware: BackpressureMiddleware)
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Start with 0 rejections
     metrics = middleware.get_metrics()
@@ -156,15 +152,13 @@ async def test_metrics_track_rejected_counts(middleware: BackpressureMiddleware)
     # Fill active + queue
     tasks = [asyncio.create_task(make_request()) for _ in range(N + Q)]
     await barrier_tool.wait_entered_at_least(N, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=N, queued=Q)
 
     # Try 5 more (should be rejected as queue_full)
     rejected_tasks = []
     for _ in range(5):
         rejected_tasks.append(asyncio.create_task(make_request()))
 
-    await asyncio.sleep(0.1)
-
     # Verify rejections
     for task in rejected_tasks:
         try:
@@ -180,11 +174,7 @@ async def test_metrics_track_rejected_counts(middleware: BackpressureMiddleware)
 
     # Cleanup
     barrier_tool.release()
-    for task in tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -199,16 +189,15 @@ async def test_metrics_track_timeout_rejections():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active + queue
     tasks = [asyncio.create_task(make_request()) for _ in range(2 + 3)]
     await barrier_tool.wait_entered_at_least(2, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(mw, active=2, queued=3)
 
     # Wait for queue timeouts
-    await asyncio.sleep(0.4)
+    await wait_state(mw, queued=0, timeout=2.0)
 
     # Verify timeout rejections
     metrics = mw.get_metrics()
@@ -217,11 +206,7 @@ async def test_metrics_track_timeout_rejections():
 
     # Cleanup
     barrier_tool.release()
-    for task in tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -236,8 +221,7 @@ async def test_metrics_track_concurrency_limit_rejections():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active
     tasks = [asyncio.create_task(make_request()) for _ in range(3)]
@@ -248,8 +232,6 @@ async def test_metrics_track_concurrency_limit_rejections():
     for _ in range(4):
         rejected_tasks.append(asyncio.create_task(make_request()))
 
-    await asyncio.sleep(0.1)
-
     # Collect rejections
     for task in rejected_tasks:
         try:
@@ -265,11 +247,7 @@ async def test_metrics_track_concurrency_limit_rejections():
 
     # Cleanup
     barrier_tool.release()
-    for task in tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -284,20 +262,18 @@ async def test_metrics_separate_rejection_reasons():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active + queue
     tasks = [asyncio.create_task(make_request()) for _ in range(2 + 2)]
     await barrier_tool.wait_entered_at_least(2, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(mw, active=2, queued=2)
 
     # Try 2 more (should be rejected as queue_full)
     queue_full_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
-    await asyncio.sleep(0.1)
 
     # Wait for queue timeouts (original 2 queued)
-    await asyncio.sleep(0.4)
+    await wait_state(mw, queued=0, timeout=2.0)
 
     # Collect queue_full rejections
     for task in queue_full_tasks:
@@ -324,7 +300,7 @@ async def test_metrics_separate_rejection_reasons():
 @pytest.mark.asyncio
 async def test_metrics_dataclass_fields():
     """
-    Test that BackpressureMetrics dataclass has all required fields.
+    Test that BackpressureMetrics snapshot has all required fields.
     """
     mw = BackpressureMiddleware(max_concurrent=5, queue_size=10, queue_timeout=5.0)
     metrics = mw.get_metrics()
@@ -358,13 +334,12 @@ async def test_get_metrics_async_is_consistent():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Launch some tasks
     tasks = [asyncio.create_task(make_request()) for _ in range(7)]
     await barrier_tool.wait_entered_at_least(5, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(mw, active=5, queued=2)
 
     # Get metrics both ways
     metrics_sync = mw.get_metrics()
@@ -376,11 +351,7 @@ async def test_get_metrics_async_is_consistent():
 
     # Cleanup
     barrier_tool.release()
-    for task in tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -395,8 +366,7 @@ async def test_metrics_persistent_across_bursts():
         return {"ok": True}
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Burst 1: fill and reject 2
     tasks1 = [asyncio.create_task(make_request()) for _ in range(5)]
@@ -428,7 +398,13 @@ async def test_metrics_exported_in_public_api():
     # Should be importable
     assert BackpressureMetrics is not None
 
-    # Should be a dataclass
-    import dataclasses
-
-    assert dataclasses.is_dataclass(BackpressureMetrics)
+    # Should be a read-only NamedTuple snapshot
+    assert issubclass(BackpressureMetrics, tuple)
+    assert BackpressureMetrics._fields == (
+        "active",
+        "queued",
+        "total_rejected",
+        "rejected_concurrency_limit",
+        "rejected_queue_full",
+        "rejected_queue_timeout",
+    )
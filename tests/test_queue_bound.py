@@ -9,7 +9,7 @@ import asyncio
 import pytest
 
 from mcp_backpressure import BackpressureMiddleware, OverloadError
-from tests.conftest import BarrierTool
+from tests.conftest import FAKE_REQUEST, BarrierTool, run_requests, wait_state
 
 
 @pytest.fixture
@@ -38,8 +38,7 @@ async def test_queued_never_exceeds_limit(middleware: BackpressureMiddleware):
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Launch N+Q+3 tasks
     total_tasks = N + Q + 3
@@ -49,7 +48,7 @@ async def test_queued_never_exceeds_limit(middleware: BackpressureMiddleware):
     await barrier_tool.wait_entered_at_least(N, timeout=2.0)
 
     # Give a moment for queue to fill
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=N, queued=Q)
 
     # Verify invariants
     assert middleware.active <= N, f"INV-01 violated: active={middleware.active} > {N}"
@@ -111,36 +110,29 @@ async def test_queue_full_rejection_immediate(middleware: BackpressureMiddleware
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Fill active + queue
     tasks = [asyncio.create_task(make_request()) for _ in range(N + Q)]
 
     # Wait for N tasks to enter
     await barrier_tool.wait_entered_at_least(N, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=N, queued=Q)
 
     # Now try one more - should be rejected immediately
-    import time
-
-    start = time.monotonic()
-    try:
+    now = asyncio.get_running_loop().time
+    start = now()
+    with pytest.raises(OverloadError) as exc_info:
         await make_request()
-        pytest.fail("Expected OverloadError but request succeeded")
-    except OverloadError as e:
-        elapsed = time.monotonic() - start
-        assert e.reason == "queue_full"
-        # Should be rejected in < 100ms (no queue timeout wait)
-        assert elapsed < 0.1, f"Rejection took too long: {elapsed:.3f}s"
+    e = exc_info.value
+    elapsed = now() - start
+    assert e.reason == "queue_full"
+    # Should be rejected in < 100ms (no queue timeout wait)
+    assert elapsed < 0.1, f"Rejection took too long: {elapsed:.3f}s"
 
     # Cleanup
     barrier_tool.release()
-    for task in tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*tasks, return_exceptions=True)
 
     # Verify no leaks
     metrics = middleware.get_metrics()
@@ -160,29 +152,23 @@ async def test_queue_size_zero_rejects_immediately(middleware: BackpressureMiddl
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active slots
     tasks = [asyncio.create_task(make_request()) for _ in range(2)]
     await barrier_tool.wait_entered_at_least(2, timeout=2.0)
 
     # Next request should be rejected immediately (no queue)
-    try:
+    with pytest.raises(OverloadError) as exc_info:
         await make_request()
-        pytest.fail("Expected OverloadError but request succeeded")
-    except OverloadError as e:
-        assert e.reason == "concurrency_limit"
-        assert e.queued == 0
-        assert e.queue_size == 0
+    e = exc_info.value
+    assert e.reason == "concurrency_limit"
+    assert e.queued == 0
+    assert e.queue_size == 0
 
     # Cleanup
     barrier_tool.release()
-    for task in tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*tasks, return_exceptions=True)
 
     metrics = mw.get_metrics()
     assert metrics.active == 0
@@ -202,15 +188,14 @@ async def test_queue_drains_correctly(middleware: BackpressureMiddleware):
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
+        return await middleware(FAKE_REQUEST, call_next)
 
     # Launch N+Q tasks (fill active + queue)
     tasks = [asyncio.create_task(make_request()) for _ in range(N + Q)]
 
     # Wait for N to be active
     await barrier_tool.wait_entered_at_least(N, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(middleware, active=N, queued=Q)
 
     # Verify state
     assert middleware.active == N
@@ -232,6 +217,46 @@ async def test_queue_drains_correctly(middleware: BackpressureMiddleware):
     assert metrics.queued == 0
 
 
+@pytest.mark.asyncio
+async def test_queue_hands_slots_over_in_fifo_order():
+    """
+    Test that a freed slot goes straight to the oldest queued request.
+
+    A request arriving while slots are being handed over must queue behind
+    the existing waiters instead of taking a slot first.
+    """
+    mw = BackpressureMiddleware(max_concurrent=1, queue_size=4, queue_timeout=5.0)
+    order = []
+    gate = asyncio.Event()
+
+    async def call_next(request):
+        order.append(request["id"])
+        await gate.wait()
+        return request["id"]
+
+    async def make_request(request_id):
+        return await mw({"type": "tool_call", "id": request_id}, call_next)
+
+    tasks = []
+    for request_id in range(4):
+        tasks.append(asyncio.create_task(make_request(request_id)))
+        await asyncio.sleep(0)
+
+    assert mw.active == 1
+    assert mw.queued == 3
+
+    # Free the slot, then arrive while the handoffs are in flight
+    gate.set()
+    tasks.append(asyncio.create_task(make_request(4)))
+
+    results = await asyncio.gather(*tasks)
+
+    assert results == [0, 1, 2, 3, 4]
+    assert order == [0, 1, 2, 3, 4]
+    assert mw.active == 0
+    assert mw.queued == 0
+
+
 @pytest.mark.asyncio
 async def test_error_payload_queue_full():
     """
@@ -244,43 +269,35 @@ async def test_error_payload_queue_full():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active + queue
     tasks = [asyncio.create_task(make_request()) for _ in range(2 + 3)]
     await barrier_tool.wait_entered_at_least(2, timeout=2.0)
-    await asyncio.sleep(0.1)
+    await wait_state(mw, active=2, queued=3)
 
     # Try one more
-    try:
+    with pytest.raises(OverloadError) as exc_info:
         await make_request()
-        pytest.fail("Expected OverloadError")
-    except OverloadError as e:
-        assert e.reason == "queue_full"
-        assert e.active == 2
-        assert e.queued == 3
-        assert e.max_concurrent == 2
-        assert e.queue_size == 3
-        assert e.queue_timeout_ms == 5000
-        assert e.code == -32001
-        assert e.message == "SERVER_OVERLOADED"
-
-        # Check JSON-RPC format
-        json_rpc = e.to_json_rpc()
-        assert json_rpc["code"] == -32001
-        assert json_rpc["message"] == "SERVER_OVERLOADED"
-        assert json_rpc["data"]["reason"] == "queue_full"
-        assert json_rpc["data"]["active"] == 2
-        assert json_rpc["data"]["queued"] == 3
+    e = exc_info.value
+    expected = {
+        "reason": "queue_full",
+        "active": 2,
+        "queued": 3,
+        "max_concurrent": 2,
+        "queue_size": 3,
+        "queue_timeout_ms": 5000,
+        "retry_after_ms": 1000,
+    }
+    assert {k: getattr(e, k) for k in expected} == expected
+    assert (e.code, e.message) == (-32001, "SERVER_OVERLOADED")
+
+    # Check JSON-RPC format
+    assert e.to_json_rpc() == {"code": -32001, "message": "SERVER_OVERLOADED", "data": expected}
 
     # Cleanup
     barrier_tool.release()
-    for task in tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*tasks, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -292,31 +309,70 @@ async def test_concurrent_queue_operations():
     """
     mw = BackpressureMiddleware(max_concurrent=5, queue_size=10, queue_timeout=5.0)
 
+    violations = []
+
+    def check_invariants():
+        metrics = mw.get_metrics()
+        if metrics.active > 5:
+            violations.append(f"INV-01 violated: active={metrics.active}")
+        if metrics.queued > 10:
+            violations.append(f"INV-02 violated: queued={metrics.queued}")
+
+    # Check at every point where the counters can change: before each
+    # admission attempt and on entering and leaving execution
     async def call_next(request):
+        check_invariants()
         await asyncio.sleep(0.01)
+        check_invariants()
         return {"ok": True}
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
-
-    # Launch many concurrent requests
-    tasks = [asyncio.create_task(make_request()) for _ in range(50)]
-
-    # Let them run
-    await asyncio.sleep(0.05)
+        check_invariants()
+        return await mw(FAKE_REQUEST, call_next)
 
-    # Check invariants periodically
-    for _ in range(5):
-        metrics = mw.get_metrics()
-        assert metrics.active <= 5, f"INV-01 violated: active={metrics.active}"
-        assert metrics.queued <= 10, f"INV-02 violated: queued={metrics.queued}"
-        await asyncio.sleep(0.02)
-
-    # Wait for completion
-    await asyncio.gather(*tasks, return_exceptions=True)
+    # Keep 20 requests in flight (more than the 15 slots) until 50 are done
+    results = await run_requests(make_request, 50, concurrency=20)
+    assert violations == []
+    assert len(results) == 50
+    assert all(r.ok or isinstance(r.exc, OverloadError) for r in results)
 
     # Final check
     metrics = mw.get_metrics()
     assert metrics.active == 0
     assert metrics.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_runtime_config_changes_reach_error_payload():
+    """
+    Test that reassigning limits at runtime is reflected in rejection payloads.
+    """
+    mw = BackpressureMiddleware(max_concurrent=1, queue_size=1, queue_timeout=5.0)
+    barrier_tool = BarrierTool()
+
+    async def call_next(request):
+        return await barrier_tool()
+
+    async def make_request():
+        return await mw(FAKE_REQUEST, call_next)
+
+    active_task = asyncio.create_task(make_request())
+    await barrier_tool.wait_entered_at_least(1, timeout=2.0)
+
+    mw.queue_size = 0
+    mw.queue_timeout = 2.5
+    mw.overload_error_code = -32099
+
+    with pytest.raises(OverloadError) as exc_info:
+        await make_request()
+    e = exc_info.value
+    assert e.reason == "concurrency_limit"
+    assert (e.code, e.queue_size, e.queue_timeout_ms) == (-32099, 0, 2500)
+
+    with pytest.raises(ValueError, match="queue_size must be >= 0"):
+        mw.queue_size = -1
+    with pytest.raises(ValueError, match="queue_timeout must be > 0"):
+        mw.queue_timeout = 0
+
+    barrier_tool.release()
+    await asyncio.gather(active_task, return_exceptions=True)
@@ -5,127 +5,69 @@ Verifies INV-05: Queue timeout → removes item from queue
 """
 
 import asyncio
-import time
+import math
+from collections import Counter
 
 import pytest
 
 from mcp_backpressure import BackpressureMiddleware, OverloadError
-from tests.conftest import BarrierTool
-
-
-@pytest.fixture
-def middleware():
-    """Create middleware with short timeout for testing."""
-    return BackpressureMiddleware(
-        max_concurrent=2, queue_size=3, queue_timeout=0.5  # 500ms timeout
-    )
+from tests.conftest import FAKE_REQUEST, BarrierTool, wait_state
 
 
 @pytest.mark.asyncio
-async def test_queue_timeout_rejects_with_correct_reason(
-    middleware: BackpressureMiddleware,
-):
-    """
-    Test that requests waiting in queue longer than queue_timeout are rejected
-    with reason='queue_timeout'.
-    """
-    barrier_tool = BarrierTool()
-
-    async def call_next(request):
-        return await barrier_tool()
-
-    async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await middleware(fake_request, call_next)
-
-    # Fill active slots (will block at barrier)
-    active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
-    await barrier_tool.wait_entered_at_least(2, timeout=2.0)
-
-    # Now launch a request that will queue
-    queued_task = asyncio.create_task(make_request())
-
-    # Wait a moment for it to enter queue
-    await asyncio.sleep(0.1)
-    assert middleware.queued == 1
-
-    # Wait for timeout (500ms + margin)
-    await asyncio.sleep(0.6)
-
-    # The queued task should have timed out
-    try:
-        result = await queued_task
-        pytest.fail(f"Expected OverloadError but got result: {result}")
-    except OverloadError as e:
-        assert e.reason == "queue_timeout", f"Expected 'queue_timeout', got '{e.reason}'"
-        assert e.code == -32001
-        assert e.message == "SERVER_OVERLOADED"
-        assert e.queue_timeout_ms == 500
-
-    # Verify queued count decremented
-    assert middleware.queued == 0, f"Expected queued=0, got {middleware.queued}"
-
-    # Cleanup
-    barrier_tool.release()
-    for task in active_tasks:
-        try:
-            await task
-        except Exception:
-            pass
-
-    metrics = middleware.get_metrics()
-    assert metrics.active == 0
-    assert metrics.queued == 0
-
-
-@pytest.mark.asyncio
-async def test_queue_timeout_removes_from_queue():
+@pytest.mark.parametrize(
+    ("max_concurrent", "queue_size", "queue_timeout", "num_queued"),
+    [
+        (2, 3, 0.5, 1),
+        (1, 5, 0.3, 3),
+        (2, 10, 0.2, 5),
+    ],
+    ids=["one_queued", "several_queued", "many_queued"],
+)
+async def test_queued_requests_time_out(max_concurrent, queue_size, queue_timeout, num_queued):
     """
     Test INV-05: Queue timeout → removes item from queue.
 
-    Verify that queued counter decrements when timeout occurs.
+    Requests waiting in queue longer than queue_timeout are rejected with
+    reason='queue_timeout' before they get to execute, and the queued
+    counter returns to zero.
     """
-    mw = BackpressureMiddleware(max_concurrent=1, queue_size=5, queue_timeout=0.3)
+    mw = BackpressureMiddleware(
+        max_concurrent=max_concurrent, queue_size=queue_size, queue_timeout=queue_timeout
+    )
     barrier_tool = BarrierTool()
 
     async def call_next(request):
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
-
-    # Fill active slot
-    active_task = asyncio.create_task(make_request())
-    await barrier_tool.wait_entered_at_least(1, timeout=2.0)
-
-    # Queue 3 requests
-    queued_tasks = [asyncio.create_task(make_request()) for _ in range(3)]
-    await asyncio.sleep(0.1)
-
-    # Verify queued
-    assert mw.queued == 3
-
-    # Wait for timeouts
-    await asyncio.sleep(0.4)
-
-    # All queued should have timed out
-    for task in queued_tasks:
-        try:
-            await task
-            pytest.fail("Expected OverloadError")
-        except OverloadError as e:
-            assert e.reason == "queue_timeout"
+        return await mw(FAKE_REQUEST, call_next)
+
+    # Fill active slots (will block at barrier), then queue requests behind them
+    active_tasks = [asyncio.create_task(make_request()) for _ in range(max_concurrent)]
+    await barrier_tool.wait_entered_at_least(max_concurrent, timeout=2.0)
+    queued_tasks = [asyncio.create_task(make_request()) for _ in range(num_queued)]
+    await wait_state(mw, active=max_concurrent, queued=num_queued)
+    assert mw.queued == num_queued
+
+    # Don't release the barrier: every queued request times out first
+    results = await asyncio.wait_for(
+        asyncio.gather(*queued_tasks, return_exceptions=True), timeout=queue_timeout * 2
+    )
+    reasons = Counter(e.reason for e in results if isinstance(e, OverloadError))
+    assert reasons == {"queue_timeout": num_queued}, f"Unexpected results: {results}"
+    for e in results:
+        assert e.code == -32001
+        assert e.message == "SERVER_OVERLOADED"
+        assert e.queue_timeout_ms == round(queue_timeout * 1000)
 
-    # Verify queue is empty
-    assert mw.queued == 0
+    # Verify queued count decremented and nothing else got to execute
+    assert mw.queued == 0, f"Expected queued=0, got {mw.queued}"
+    assert barrier_tool.entered == max_concurrent
 
     # Cleanup
     barrier_tool.release()
-    try:
-        await active_task
-    except Exception:
-        pass
+    await asyncio.gather(*active_tasks, return_exceptions=True)
 
     metrics = mw.get_metrics()
     assert metrics.active == 0
@@ -146,35 +88,31 @@ async def test_queue_timeout_uses_monotonic_time():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active
     active_task = asyncio.create_task(make_request())
     await barrier_tool.wait_entered_at_least(1, timeout=2.0)
 
-    # Queue one request and measure timeout
-    start = time.monotonic()
+    # Queue one request and measure timeout on the loop's monotonic clock
+    now = asyncio.get_running_loop().time
+    start = now()
     queued_task = asyncio.create_task(make_request())
 
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=1)
     assert mw.queued == 1
 
-    try:
+    with pytest.raises(OverloadError) as exc_info:
         await queued_task
-        pytest.fail("Expected OverloadError")
-    except OverloadError as e:
-        elapsed = time.monotonic() - start
-        assert e.reason == "queue_timeout"
-        # Should timeout around 400ms (±100ms margin)
-        assert 0.3 < elapsed < 0.6, f"Timeout took {elapsed:.3f}s, expected ~0.4s"
+    e = exc_info.value
+    elapsed = now() - start
+    assert e.reason == "queue_timeout"
+    # Should timeout around 400ms (±100ms margin)
+    assert 0.3 < elapsed < 0.6, f"Timeout took {elapsed:.3f}s, expected ~0.4s"
 
     # Cleanup
     barrier_tool.release()
-    try:
-        await active_task
-    except Exception:
-        pass
+    await asyncio.gather(active_task, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -189,8 +127,7 @@ async def test_multiple_requests_timeout_independently():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active
     active_task = asyncio.create_task(make_request())
@@ -203,75 +140,17 @@ async def test_multiple_requests_timeout_independently():
     task2 = asyncio.create_task(make_request())
     await asyncio.sleep(0.1)
 
-    # task1 should timeout first (enqueued earlier)
-    await asyncio.sleep(0.3)  # Total: task1=500ms, task2=400ms
-
-    # task1 should have timed out
-    try:
-        await task1
-        pytest.fail("Expected task1 to timeout")
-    except OverloadError as e:
-        assert e.reason == "queue_timeout"
-
-    # task2 may or may not have timed out yet (depends on exact timing)
-
-    # Cleanup
-    barrier_tool.release()
-    for task in [active_task, task2]:
-        try:
-            await task
-        except Exception:
-            pass
-
-
-@pytest.mark.asyncio
-async def test_queue_timeout_before_execution():
-    """
-    Test that timeout can occur before request gets to execute.
-    """
-    mw = BackpressureMiddleware(max_concurrent=2, queue_size=10, queue_timeout=0.2)
-    barrier_tool = BarrierTool()
-
-    async def call_next(request):
-        return await barrier_tool()
-
-    async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
-
-    # Fill active slots
-    active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
-    await barrier_tool.wait_entered_at_least(2, timeout=2.0)
-
-    # Queue many requests (they'll all timeout before active slots free)
-    queued_tasks = [asyncio.create_task(make_request()) for _ in range(5)]
-
-    # Wait for all to queue
-    await asyncio.sleep(0.1)
-    assert mw.queued == 5
-
-    # Wait for timeouts (don't release barrier)
-    await asyncio.sleep(0.3)
-
-    # All queued should have timed out
-    timeout_count = 0
-    for task in queued_tasks:
-        try:
-            await task
-        except OverloadError as e:
-            if e.reason == "queue_timeout":
-                timeout_count += 1
+    # task1 should timeout first (enqueued earlier): 200ms left vs 400ms for task2
+    with pytest.raises(OverloadError) as exc_info:
+        await asyncio.wait_for(task1, timeout=1.0)
+    assert exc_info.value.reason == "queue_timeout"
 
-    assert timeout_count == 5, f"Expected 5 timeouts, got {timeout_count}"
-    assert mw.queued == 0
+    # task2 is still within its own timeout window
+    assert not task2.done()
 
     # Cleanup
     barrier_tool.release()
-    for task in active_tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(active_task, task2, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -286,8 +165,7 @@ async def test_queue_timeout_error_payload():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active
     active_tasks = [asyncio.create_task(make_request()) for _ in range(2)]
@@ -295,39 +173,31 @@ async def test_queue_timeout_error_payload():
 
     # Queue one
     queued_task = asyncio.create_task(make_request())
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=1)
 
     # Wait for timeout
-    await asyncio.sleep(0.3)
-
-    try:
-        await queued_task
-        pytest.fail("Expected OverloadError")
-    except OverloadError as e:
-        # Verify all fields
-        assert e.reason == "queue_timeout"
-        assert e.code == -32001
-        assert e.message == "SERVER_OVERLOADED"
-        assert e.active == 2
-        assert e.max_concurrent == 2
-        assert e.queued == 0  # Already decremented
-        assert e.queue_size == 3
-        assert e.queue_timeout_ms == 300
-        assert e.retry_after_ms == 1000
-
-        # Verify JSON-RPC format
-        json_rpc = e.to_json_rpc()
-        assert json_rpc["code"] == -32001
-        assert json_rpc["data"]["reason"] == "queue_timeout"
-        assert json_rpc["data"]["queue_timeout_ms"] == 300
+    with pytest.raises(OverloadError) as exc_info:
+        await asyncio.wait_for(queued_task, timeout=0.6)
+    e = exc_info.value
+    # Verify all fields
+    expected = {
+        "reason": "queue_timeout",
+        "active": 2,
+        "queued": 0,  # Already decremented
+        "max_concurrent": 2,
+        "queue_size": 3,
+        "queue_timeout_ms": 300,
+        "retry_after_ms": 1000,
+    }
+    assert {k: getattr(e, k) for k in expected} == expected
+    assert (e.code, e.message) == (-32001, "SERVER_OVERLOADED")
+
+    # Verify JSON-RPC format
+    assert e.to_json_rpc() == {"code": -32001, "message": "SERVER_OVERLOADED", "data": expected}
 
     # Cleanup
     barrier_tool.release()
-    for task in active_tasks:
-        try:
-            await task
-        except Exception:
-            pass
+    await asyncio.gather(*active_tasks, return_exceptions=True)
 
 
 @pytest.mark.asyncio
@@ -342,6 +212,42 @@ async def test_zero_timeout_rejects_immediately():
         BackpressureMiddleware(max_concurrent=5, queue_size=10, queue_timeout=-1.0)
 
 
+@pytest.mark.asyncio
+async def test_infinite_timeout_waits_until_slot_frees():
+    """
+    Test that queue_timeout=math.inf queues without a deadline.
+
+    Error payloads report queue_timeout_ms=0 for an unbounded wait.
+    """
+    mw = BackpressureMiddleware(max_concurrent=1, queue_size=1, queue_timeout=math.inf)
+    barrier_tool = BarrierTool()
+
+    async def call_next(request):
+        return await barrier_tool()
+
+    async def make_request():
+        return await mw(FAKE_REQUEST, call_next)
+
+    active_task = asyncio.create_task(make_request())
+    await barrier_tool.wait_entered_at_least(1, timeout=2.0)
+    queued_task = asyncio.create_task(make_request())
+    await wait_state(mw, queued=1)
+    assert mw.queued == 1
+
+    with pytest.raises(OverloadError) as exc_info:
+        await make_request()
+    assert exc_info.value.reason == "queue_full"
+    assert exc_info.value.queue_timeout_ms == 0
+
+    barrier_tool.release()
+    results = await asyncio.gather(active_task, queued_task)
+    assert results == [{"ok": True}, {"ok": True}]
+
+    metrics = mw.get_metrics()
+    assert metrics.active == 0
+    assert metrics.queued == 0
+
+
 @pytest.mark.asyncio
 async def test_queue_processes_non_timed_out_requests():
     """
@@ -354,8 +260,7 @@ async def test_queue_processes_non_timed_out_requests():
         return await barrier_tool()
 
     async def make_request():
-        fake_request = {"type": "tool_call"}
-        return await mw(fake_request, call_next)
+        return await mw(FAKE_REQUEST, call_next)
 
     # Fill active
     active_task = asyncio.create_task(make_request())
@@ -363,7 +268,7 @@ async def test_queue_processes_non_timed_out_requests():
 
     # Queue 3 requests (should not timeout with 2s limit)
     queued_tasks = [asyncio.create_task(make_request()) for _ in range(3)]
-    await asyncio.sleep(0.1)
+    await wait_state(mw, queued=3)
 
     assert mw.queued == 3
 
@@ -381,3 +286,31 @@ async def test_queue_processes_non_timed_out_requests():
     metrics = mw.get_metrics()
     assert metrics.active == 0
     assert metrics.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_change_applies_to_new_waits():
+    """
+    Test that switching from math.inf to a finite queue_timeout at runtime
+    arms the timer for new waits and updates the reported queue_timeout_ms.
+    """
+    mw = BackpressureMiddleware(max_concurrent=1, queue_size=1, queue_timeout=math.inf)
+    barrier_tool = BarrierTool()
+
+    async def call_next(request):
+        return await barrier_tool()
+
+    async def make_request():
+        return await mw(FAKE_REQUEST, call_next)
+
+    active_task = asyncio.create_task(make_request())
+    await barrier_tool.wait_entered_at_least(1, timeout=2.0)
+
+    mw.queue_timeout = 0.05
+    with pytest.raises(OverloadError) as exc_info:
+        await asyncio.wait_for(make_request(), timeout=1.0)
+    assert exc_info.value.reason == "queue_timeout"
+    assert exc_info.value.queue_timeout_ms == 50
+
+    barrier_tool.release()
+    await asyncio.gather(active_task, return_exceptions=True)